@@ -1,16 +1,20 @@
+import aiosqlite
+import asyncio
 import functools
 import logging
+import mmap
 import os
 import psutil
 import re
-import sqlite3
+import tempfile
+import time
 from dotenv import load_dotenv
-from httpx import AsyncClient, HTTPStatusError
 from logging.handlers import TimedRotatingFileHandler
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, List, Set, Tuple
 from telegram import Document, Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 from telegram.ext import Application, ConversationHandler, CommandHandler, ContextTypes, MessageHandler, filters, CallbackQueryHandler
+from telegram.request import HTTPXRequest
 from telegram.warnings import PTBUserWarning
 from warnings import filterwarnings
 
@@ -21,6 +25,16 @@ filterwarnings(action="ignore", message=r".*CallbackQueryHandler",
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Precompiled EDL parsing patterns (bytes-level, so lines never need a full decode)
+_TIME_RE = re.compile(rb"\d{2}:\d{2}:\d{2}")
+_NAME_RE = re.compile(rb"\|M:(.*?) \|D:")
+
+
+def _is_timecode(value: bytes) -> bool:
+    """Checks that a byte string looks like 'HH:MM:SS'."""
+    return (len(value) == 8 and value[2:3] == b':' and value[5:6] == b':'
+            and value[0:2].isdigit() and value[3:5].isdigit() and value[6:8].isdigit())
+
 
 class Config:
     """
@@ -30,55 +44,61 @@ class Config:
     def __init__(self, dotenv_path: str = ".env"):
         load_dotenv(dotenv_path)
 
-        self.TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN")
-        self.PAYPAL_LINK: str = os.getenv("PAYPAL_LINK")
-        self.API_URL: str = os.getenv("API_URL").format(bot_token=self.TELEGRAM_BOT_TOKEN)
-        
-        self.M_COLORS: List[str] = os.getenv("M_COLORS").split(',')
-        
-        self.DATABASE_NAME: Path = Path(os.getenv("DATABASE_NAME"))
-        self.LOGFILE_NAME: Path = Path(os.getenv("LOGFILE_NAME"))
-
-        self.MARKERS_COLOR_BUTTON: str = os.getenv("MARKERS_COLOR_BUTTON")
-        self.CHAPTERS_SEPARATOR_BUTTON: str = os.getenv(
-            "CHAPTERS_SEPARATOR_BUTTON")
-        self.HELP_BUTTON: str = os.getenv("HELP_BUTTON")
-
-        self.GLOBAL_TTL: int = int(os.getenv("GLOBAL_TTL"))
-        self.KEEP_ALIVE_INTERVAL: int = int(os.getenv("KEEP_ALIVE_INTERVAL"))
-        self.RAM_THRESHOLD: int = int(os.getenv("RAM_THRESHOLD"))
-
-        self.MARKERS_COLOR_PATTERN: str = os.getenv("MARKERS_COLOR_PATTERN")
-
-        self.COLOR_TIMEOUT_MESSAGE: str = os.getenv(
-            "COLOR_TIMEOUT_MESSAGE").format(ttl=self.GLOBAL_TTL)
-        self.SEPARATOR_TIMEOUT_MESSAGE: str = os.getenv(
-            "SEPARATOR_TIMEOUT_MESSAGE").format(ttl=self.GLOBAL_TTL)
-        self.ERROR_MESSAGE: str = os.getenv("ERROR_MESSAGE")
-        self.RAM_FULL_MESSAGE: str = os.getenv("RAM_FULL_MESSAGE")
-        
-        self.START_MESSAGE: str = os.getenv("START_MESSAGE").format(
+        # Single snapshot of the environment; missing keys raise KeyError,
+        # which main() reports as a configuration error
+        env: Dict[str, str] = os.environ.copy()
+        self._env = env
+
+        self.TELEGRAM_BOT_TOKEN: str = env["TELEGRAM_BOT_TOKEN"]
+        self.PAYPAL_LINK: str = env["PAYPAL_LINK"]
+
+        self.M_COLORS: List[str] = env["M_COLORS"].split(',')
+
+        self.DATABASE_NAME: Path = Path(env["DATABASE_NAME"])
+        self.LOGFILE_NAME: Path = Path(env["LOGFILE_NAME"])
+
+        self.MARKERS_COLOR_BUTTON: str = env["MARKERS_COLOR_BUTTON"]
+        self.CHAPTERS_SEPARATOR_BUTTON: str = env["CHAPTERS_SEPARATOR_BUTTON"]
+        self.HELP_BUTTON: str = env["HELP_BUTTON"]
+
+        self.GLOBAL_TTL: int = int(env["GLOBAL_TTL"])
+        self.RAM_THRESHOLD: int = int(env["RAM_THRESHOLD"])
+
+        self.MARKERS_COLOR_PATTERN: str = env["MARKERS_COLOR_PATTERN"]
+
+        self.ERROR_MESSAGE: str = env["ERROR_MESSAGE"]
+        self.RAM_FULL_MESSAGE: str = env["RAM_FULL_MESSAGE"]
+        self.SELECT_MARKERS_COLOR_MESSAGE: str = env["SELECT_MARKERS_COLOR_MESSAGE"]
+        self.INSERT_SEPARATOR_MESSAGE: str = env["INSERT_SEPARATOR_MESSAGE"]
+        self.EDL_FILE_ERROR_MESSAGE: str = env["EDL_FILE_ERROR_MESSAGE"]
+        self.UPLOAD_EDL_FILE_MESSAGE: str = env["UPLOAD_EDL_FILE_MESSAGE"]
+        self.MARKERS_COLOR_UPDATED_MESSAGE: str = env["MARKERS_COLOR_UPDATED_MESSAGE"]
+        self.CHAPTERS_SEPARATOR_UPDATED_MESSAGE: str = env["CHAPTERS_SEPARATOR_UPDATED_MESSAGE"]
+        self.END_CONVERSATION_MESSAGE: str = env["END_CONVERSATION_MESSAGE"]
+        self.DONATE_MESSAGE: str = env["DONATE_MESSAGE"]
+
+    # Formatted messages are built lazily and cached on first access
+
+    @functools.cached_property
+    def COLOR_TIMEOUT_MESSAGE(self) -> str:
+        return self._env["COLOR_TIMEOUT_MESSAGE"].format(ttl=self.GLOBAL_TTL)
+
+    @functools.cached_property
+    def SEPARATOR_TIMEOUT_MESSAGE(self) -> str:
+        return self._env["SEPARATOR_TIMEOUT_MESSAGE"].format(ttl=self.GLOBAL_TTL)
+
+    @functools.cached_property
+    def START_MESSAGE(self) -> str:
+        return self._env["START_MESSAGE"].format(
             MARKERS_COLOR_BUTTON=self.MARKERS_COLOR_BUTTON,
             CHAPTERS_SEPARATOR_BUTTON=self.CHAPTERS_SEPARATOR_BUTTON,
             GLOBAL_TTL=self.GLOBAL_TTL,
             HELP_BUTTON=self.HELP_BUTTON
         )
-        self.SELECT_MARKERS_COLOR_MESSAGE: str = os.getenv(
-            "SELECT_MARKERS_COLOR_MESSAGE")
-        self.INSERT_SEPARATOR_MESSAGE: str = os.getenv(
-            "INSERT_SEPARATOR_MESSAGE")
-        self.EDL_FILE_ERROR_MESSAGE: str = os.getenv("EDL_FILE_ERROR_MESSAGE")
-        self.UPLOAD_EDL_FILE_MESSAGE: str = os.getenv(
-            "UPLOAD_EDL_FILE_MESSAGE")
-        self.HELP_MESSAGE: str = os.getenv(
-            "HELP_MESSAGE").format(GLOBAL_TTL=self.GLOBAL_TTL)
-        self.MARKERS_COLOR_UPDATED_MESSAGE: str = os.getenv(
-            "MARKERS_COLOR_UPDATED_MESSAGE")
-        self.CHAPTERS_SEPARATOR_UPDATED_MESSAGE: str = os.getenv(
-            "CHAPTERS_SEPARATOR_UPDATED_MESSAGE")
-        self.END_CONVERSATION_MESSAGE: str = os.getenv(
-            "END_CONVERSATION_MESSAGE")
-        self.DONATE_MESSAGE: str = os.getenv("DONATE_MESSAGE")
+
+    @functools.cached_property
+    def HELP_MESSAGE(self) -> str:
+        return self._env["HELP_MESSAGE"].format(GLOBAL_TTL=self.GLOBAL_TTL)
 
 
 class DatabaseManager:
@@ -87,50 +107,81 @@ class DatabaseManager:
     """
 
     def __init__(self, db_name: str):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.create_db()
-
-    def __enter__(self):
+        self.db_name = db_name
+        self.conn: aiosqlite.Connection = None
+        self._write_lock = asyncio.Lock()
+        self._choice_cache: Dict[int, Tuple[str, str]] = {}
+
+    async def connect(self):
+        self.conn = await aiosqlite.connect(self.db_name)
+        await self.conn.execute('PRAGMA journal_mode=WAL')
+        await self.conn.execute('PRAGMA synchronous=NORMAL')
+        await self.conn.execute('PRAGMA busy_timeout=5000')
+        await self.create_db()
         logger.info("Database connection opened")
-        return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
+    async def close(self):
         if self.conn:
-            self.conn.close()
+            await self.conn.close()
+            self.conn = None
             logger.info("Database connection closed")
 
-    def _execute(self, query, params=(), commit=False, fetchone=False, fetchall=False):
+    async def _execute(self, query, params=(), commit=False, fetchone=False, fetchall=False):
         try:
-            with self.conn:
-                cursor = self.conn.cursor()
-                cursor.execute(query, params)
-                if commit:
+            if commit:
+                async with self._write_lock:
+                    cursor = await self.conn.execute(query, params)
+                    await self.conn.commit()
                     return cursor.lastrowid
-                if fetchone:
-                    return cursor.fetchone()
-                if fetchall:
-                    return cursor.fetchall()
-        except sqlite3.Error as e:
+            cursor = await self.conn.execute(query, params)
+            if fetchone:
+                return await cursor.fetchone()
+            if fetchall:
+                return await cursor.fetchall()
+        except aiosqlite.Error as e:
             logger.error(f"Database error: {e}", exc_info=True)
             return None
 
-    def create_db(self):
-        self._execute('''
+    async def create_db(self):
+        await self._execute('''
             CREATE TABLE IF NOT EXISTS choices (user_id INTEGER PRIMARY KEY, m_color TEXT DEFAULT 'Blue', c_separator TEXT DEFAULT '-')
-        ''')
+        ''', commit=True)
 
-    def add_user(self, user_id: int): self._execute(
-        'INSERT OR IGNORE INTO choices (user_id) VALUES (?)', (user_id,), commit=True)
+    async def add_user(self, user_id: int):
+        try:
+            async with self._write_lock:
+                cursor = await self.conn.execute(
+                    'INSERT OR IGNORE INTO choices (user_id) VALUES (?)', (user_id,))
+                await self.conn.commit()
+                if cursor.rowcount:
+                    self._choice_cache[user_id] = ('Blue', '-')
+        except aiosqlite.Error as e:
+            logger.error(f"Database error: {e}", exc_info=True)
+
+    async def get_user_ids(self) -> List[int]:
+        rows = await self._execute('SELECT user_id FROM choices', fetchall=True)
+        return [row[0] for row in rows] if rows else []
 
-    def get_choices(self, user_id: int) -> sqlite3.Row: return self._execute(
-        'SELECT * FROM choices WHERE user_id = ?', (user_id,), fetchone=True)
+    async def get_choices(self, user_id: int) -> Tuple[str, str]:
+        choice = self._choice_cache.get(user_id)
+        if choice is None:
+            row = await self._execute(
+                'SELECT m_color, c_separator FROM choices WHERE user_id = ?', (user_id,), fetchone=True)
+            choice = tuple(row) if row else ('Blue', '-')
+            self._choice_cache[user_id] = choice
+        return choice
 
-    def update_markers_color(self, user_id: int, m_color: str): self._execute(
-        'UPDATE choices SET m_color = ? WHERE user_id = ?', (m_color, user_id), commit=True)
+    async def update_markers_color(self, user_id: int, m_color: str):
+        await self._execute(
+            'UPDATE choices SET m_color = ? WHERE user_id = ?', (m_color, user_id), commit=True)
+        _, c_separator = await self.get_choices(user_id)
+        self._choice_cache[user_id] = (m_color, c_separator)
 
-    def update_chapters_separator(self, user_id: int, c_separator: str): self._execute(
-        'UPDATE choices SET c_separator = ? WHERE user_id = ?', (c_separator, user_id), commit=True)
+    async def update_chapters_separator(self, user_id: int, c_separator: str):
+        await self._execute(
+            'UPDATE choices SET c_separator = ? WHERE user_id = ?', (c_separator, user_id), commit=True)
+        m_color, _ = await self.get_choices(user_id)
+        self._choice_cache[user_id] = (m_color, c_separator)
 
 
 def setup_logging(logfile_name: str, bot_token: str):
@@ -152,14 +203,31 @@ def setup_logging(logfile_name: str, bot_token: str):
     httpx_logger.addFilter(lambda record: bot_token not in record.getMessage())
     
 
-def handle_errors(func):
+@functools.lru_cache(maxsize=128)
+def _build_reply_keyboard(m_color: str, c_separator: str, markers_color_button: str,
+                          chapters_separator_button: str, help_button: str) -> ReplyKeyboardMarkup:
+    """Builds (and memoizes) the reply keyboard for a choice/button combination."""
+    reply_keyboard = [
+        [f'{markers_color_button}\n[ {m_color} ]'],
+        [f'{chapters_separator_button}\n[ {c_separator} ]'],
+        [help_button]
+    ]
+    return ReplyKeyboardMarkup(reply_keyboard, resize_keyboard=True)
+
+
+def handler(func):
     """
-    Decorator for centralized error handling in bot handlers.
+    Decorator for common handler setup (logging, adding user to DB)
+    and centralized error handling.
     """
     @functools.wraps(func)
     async def wrapper(self: 'DVChapterBot', update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         user_id = update.effective_user.id if update.effective_user else "N/A"
+        logger.info(f"{func.__name__} for {user_id}")
         try:
+            if user_id not in self._known_users:
+                await self.db.add_user(user_id)
+                self._known_users.add(user_id)
             return await func(self, update, context, *args, **kwargs)
         except Exception as e:
             logger.error(
@@ -172,19 +240,6 @@ def handle_errors(func):
     return wrapper
 
 
-def function_setup(func):
-    """
-    Decorator to handle common function setup: logging, and adding user to DB.
-    """
-    @functools.wraps(func)
-    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        user_id = update.effective_user.id if update.effective_user else "N/A"
-        logger.info(f"{func.__name__} for {user_id}")
-        self.db.add_user(user_id)
-        return await func(self, update, context, *args, **kwargs)
-    return wrapper
-
-
 class DVChapterBot:
     """
     Main Bot class. Manages logic, handlers, and execution.
@@ -195,80 +250,135 @@ class DVChapterBot:
     TIMEOUT = ConversationHandler.TIMEOUT
     END = ConversationHandler.END
 
-    def __init__(self, config: Config, db_manager: DatabaseManager, client: AsyncClient):
+    # Seconds a free-memory reading stays valid before re-probing /proc
+    MEM_CHECK_TTL = 1.0
+
+    def __init__(self, config: Config, db_manager: DatabaseManager):
         self.config = config
         self.db = db_manager
-        self.client = client
+        self._last_mem_check: Tuple[float, float] = (-1.0, 0.0)
+        self._known_users: Set[int] = set()
         self.application = Application.builder().token(
-            self.config.TELEGRAM_BOT_TOKEN).build()
+            self.config.TELEGRAM_BOT_TOKEN).concurrent_updates(16).request(
+            HTTPXRequest(connection_pool_size=16, pool_timeout=5)).get_updates_request(
+            HTTPXRequest(connection_pool_size=8, pool_timeout=5)).post_init(
+            self._post_init).post_shutdown(self._post_shutdown).build()
+
+        # Button filters compiled once, with labels escaped so special
+        # characters in the configured strings cannot alter the patterns
+        self._markers_button_re = re.compile(
+            rf"^{re.escape(self.config.MARKERS_COLOR_BUTTON)}")
+        self._separator_button_re = re.compile(
+            rf"^{re.escape(self.config.CHAPTERS_SEPARATOR_BUTTON)}")
+        self._help_button_re = re.compile(
+            rf"^{re.escape(self.config.HELP_BUTTON)}$")
+        self._not_buttons_re = re.compile(
+            rf"^(?!({re.escape(self.config.CHAPTERS_SEPARATOR_BUTTON)}"
+            rf"|{re.escape(self.config.MARKERS_COLOR_BUTTON)}"
+            rf"|{re.escape(self.config.HELP_BUTTON)}))")
+
+        # Inline keyboards built from immutable config, reused for every reply
+        self._color_inline_markup = InlineKeyboardMarkup(
+            self._build_color_rows(self.config.M_COLORS))
+        self._donate_inline_markup = InlineKeyboardMarkup(
+            [[InlineKeyboardButton("❤️ Donate via PayPal ❤️", url=self.config.PAYPAL_LINK)]])
+
+    @staticmethod
+    def _build_color_rows(colors: List[str]) -> List[List[InlineKeyboardButton]]:
+        return [
+            [InlineKeyboardButton(color, callback_data=color) for color in colors[i:i+2]]
+            for i in range(0, len(colors), 2)
+        ]
 
-    # --------------- UTILITY METHODS ----------------
+    async def _post_init(self, application: Application):
+        await self.db.connect()
+        self._known_users.update(await self.db.get_user_ids())
 
-    async def _create_reply_keyboard(self, user_id: int) -> ReplyKeyboardMarkup:
-        choice = self.db.get_choices(user_id)
-        m_color = choice['m_color']
-        c_separator = choice['c_separator']
+    async def _post_shutdown(self, application: Application):
+        await self.db.close()
 
-        reply_keyboard = [
-            [f'{self.config.MARKERS_COLOR_BUTTON}\n[ {m_color} ]'],
-            [f'{self.config.CHAPTERS_SEPARATOR_BUTTON}\n[ {c_separator} ]'],
-            [self.config.HELP_BUTTON]
-        ]
-        return ReplyKeyboardMarkup(reply_keyboard, resize_keyboard=True)
+    # --------------- UTILITY METHODS ----------------
 
     async def send_reply(self, update: Update, text: str, **kwargs):
         """Safely sends a reply message to an Update or CallbackQuery."""
-        target_message = None
-        user_id = None
-
         callback_query = update.callback_query
         if callback_query:
             await callback_query.answer()
-            target_message = callback_query.message
-            user_id = callback_query.from_user.id
+            target_message, user_id = callback_query.message, callback_query.from_user.id
         else:
-            target_message = update.effective_message
-            user_id = update.effective_user.id
+            target_message, user_id = update.effective_message, update.effective_user.id
 
         if target_message and user_id:
-            reply_keyboard_markup = await self._create_reply_keyboard(user_id)
-            kwargs.setdefault('reply_markup', reply_keyboard_markup)
+            if 'reply_markup' not in kwargs:
+                m_color, c_separator = await self.db.get_choices(user_id)
+                kwargs['reply_markup'] = _build_reply_keyboard(
+                    m_color, c_separator,
+                    self.config.MARKERS_COLOR_BUTTON,
+                    self.config.CHAPTERS_SEPARATOR_BUTTON,
+                    self.config.HELP_BUTTON)
             await target_message.reply_text(text, **kwargs)
         else:
             logger.error(
-                f"send_reply: Could not find target message or user_id.")
+                "send_reply: Could not find target message or user_id.")
 
     async def _process_edl_file(self, user_id: int, file: Document) -> str:
         file_prep = await file.get_file()
-        file_path = Path(await file_prep.download_to_drive())
+        m_color, c_separator = await self.db.get_choices(user_id)
 
+        # Prefer the RAM-backed tmpfs so the EDL never touches the disk
+        fd, file_path = tempfile.mkstemp(
+            suffix='.edl', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+        os.close(fd)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                if not lines:
-                    return ''
-                return self._format_chapters(user_id, lines)
+            await file_prep.download_to_drive(custom_path=file_path)
+            return await asyncio.to_thread(
+                self._parse_edl_sync, file_path, m_color, c_separator)
         finally:
-            if file_path.exists():
-                file_path.unlink()
-
-    def _format_chapters(self, user_id: int, lines: List[str]) -> str:
-        choices = self.db.get_choices(user_id)
-        m_color = choices['m_color']
-        c_separator = choices['c_separator']
-        n_lines = len(lines)
-
-        if n_lines < 6:
-            return ''
-
+            try:
+                os.unlink(file_path)
+            except FileNotFoundError:
+                pass
+
+    def _parse_edl_sync(self, file_path: str, m_color: str, c_separator: str) -> str:
+        with open(file_path, 'rb') as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return self._format_chapters(
+                        iter(mm.readline, b''), m_color, c_separator)
+            except ValueError:
+                # Empty files cannot be mapped
+                return ''
+
+    def _format_chapters(self, lines: Iterable[bytes], m_color: str, c_separator: str) -> str:
+        color_token = f'C:ResolveColor{m_color}'.encode()
         results = ['CAPITOLI\n--------------------']
-        for i in range(3, n_lines, 3):
-            if f'C:ResolveColor{m_color}' in lines[i+1]:
-                m_time = re.search(r"\d{2}:\d{2}:\d{2}", lines[i])
-                m_name = re.search(r"\|M:(.*?) \|D:", lines[i+1])
+
+        time_line = b''
+        time_offset = -1
+        for i, line in enumerate(lines):
+            if i < 3:
+                continue
+            if i % 3 == 0:
+                time_line = line
+            elif i % 3 == 1 and color_token in line:
+                # The timecode column is fixed-width, so after locating it
+                # once with the regex a validated slice is enough
+                m_time = None
+                if time_offset >= 0:
+                    candidate = time_line[time_offset:time_offset + 8]
+                    if _is_timecode(candidate):
+                        m_time = candidate
+                if m_time is None:
+                    match = _TIME_RE.search(time_line)
+                    if match:
+                        m_time = match.group(0)
+                        time_offset = match.start()
+                m_name = _NAME_RE.search(line)
                 if m_time and m_name:
+                    # Decode only the matched spans, never the whole file
+                    m_name_text = m_name.group(1).decode('utf-8', 'replace')
                     results.append(
-                        f'{m_time.group(0)} {c_separator} {m_name.group(1)}')
+                        f"{m_time.decode('ascii')} {c_separator} {m_name_text}")
 
         return '\n'.join(results) if len(results) > 1 else ''
 
@@ -276,55 +386,36 @@ class DVChapterBot:
         user_id = update.effective_user.id
         logger.info(f"Memory free check for {user_id}")
 
-        if psutil.virtual_memory().free / 1024 ** 2 < self.config.RAM_THRESHOLD:
+        ts, free_mb = self._last_mem_check
+        now = time.monotonic()
+        if now - ts >= self.MEM_CHECK_TTL:
+            free_mb = psutil.virtual_memory().free / 1024 ** 2
+            self._last_mem_check = (now, free_mb)
+
+        if free_mb < self.config.RAM_THRESHOLD:
             logger.warning(f"Memory full for {user_id}")
             await self.send_reply(update, self.config.RAM_FULL_MESSAGE)
             return False
         return True
-    
-    async def _keep_alive(self, context: ContextTypes.DEFAULT_TYPE):
-        try:
-            response = await self.client.get(self.config.API_URL)
-            response.raise_for_status()
-            bot_info = response.json()
-            username = bot_info.get("result", {}).get("username")
-            if username:
-                logger.info(f"{username} alive")
-            else:
-                logger.error(f"Error in _keep_alive: 'username' not found in response: {bot_info}", exc_info=True)
-        except HTTPStatusError as e:
-            logger.error(f"HTTP error in _keep_alive: {e.response.status_code} - {e.response.text}", exc_info=True)
-        except Exception as e:
-            logger.error(f"Error in _keep_alive: {e}", exc_info=True)
 
     # --------------- COMMAND HANDLERS ----------------
 
-    @handle_errors
-    @function_setup
+    @handler
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         message = self.config.START_MESSAGE
         await self.send_reply(update, message)
 
-    @handle_errors
-    @function_setup
+    @handler
     async def change_markers_color_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        colors = self.config.M_COLORS
-        inline_keyboard = [
-            [InlineKeyboardButton(color, callback_data=color) for color in colors[i:i+2]]
-            for i in range(0, len(colors), 2)
-        ]
-        inline_keyboard_markup = InlineKeyboardMarkup(inline_keyboard)
-        await self.send_reply(update, self.config.SELECT_MARKERS_COLOR_MESSAGE, reply_markup=inline_keyboard_markup)
+        await self.send_reply(update, self.config.SELECT_MARKERS_COLOR_MESSAGE, reply_markup=self._color_inline_markup)
         return self.CHANGE_MARKERS_COLOR
 
-    @handle_errors
-    @function_setup
+    @handler
     async def change_chapters_separator_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         await self.send_reply(update, self.config.INSERT_SEPARATOR_MESSAGE)
         return self.CHANGE_CHAPTERS_SEPARATOR
 
-    @handle_errors
-    @function_setup
+    @handler
     async def upload_file_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         if not await self._free_memory_check(update):
             return
@@ -339,55 +430,46 @@ class DVChapterBot:
         else:
             await self.send_reply(update, self.config.UPLOAD_EDL_FILE_MESSAGE)
 
-    @handle_errors
-    @function_setup
+    @handler
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         message = self.config.HELP_MESSAGE
         await self.send_reply(update, message)
 
-    @handle_errors
-    @function_setup
+    @handler
     async def donate_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        inline_keyboard = [[InlineKeyboardButton("❤️ Donate via PayPal ❤️", url=self.config.PAYPAL_LINK)]]
-        inline_keyboard_markup = InlineKeyboardMarkup(inline_keyboard)
-        await self.send_reply(update, self.config.DONATE_MESSAGE, reply_markup=inline_keyboard_markup)
+        await self.send_reply(update, self.config.DONATE_MESSAGE, reply_markup=self._donate_inline_markup)
 
     # --------------- CALLBACK HANDLERS ----------------
 
-    @handle_errors
-    @function_setup
+    @handler
     async def change_markers_color_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         query = update.callback_query
         m_color = query.data
 
-        self.db.update_markers_color(update.effective_user.id, m_color)
+        await self.db.update_markers_color(update.effective_user.id, m_color)
         await self.send_reply(update, self.config.MARKERS_COLOR_UPDATED_MESSAGE.format(m_color=m_color))
         return self.END
 
-    @handle_errors
-    @function_setup
+    @handler
     async def change_chapters_separator_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         c_separator = update.message.text
 
-        self.db.update_chapters_separator(
+        await self.db.update_chapters_separator(
             update.effective_user.id, c_separator)
         await self.send_reply(update, self.config.CHAPTERS_SEPARATOR_UPDATED_MESSAGE.format(c_separator=c_separator))
         return self.END
 
-    @handle_errors
-    @function_setup
+    @handler
     async def end_conversation_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         await self.send_reply(update, self.config.END_CONVERSATION_MESSAGE)
         return self.END
 
-    @handle_errors
-    @function_setup
+    @handler
     async def color_timeout_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         message = self.config.COLOR_TIMEOUT_MESSAGE
         await self.send_reply(update, message)
 
-    @handle_errors
-    @function_setup
+    @handler
     async def separator_timeout_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         message = self.config.SEPARATOR_TIMEOUT_MESSAGE
         await self.send_reply(update, message)
@@ -399,7 +481,7 @@ class DVChapterBot:
             entry_points=[
                 CommandHandler("color", self.change_markers_color_command),
                 MessageHandler(filters.Regex(
-                    f"^{self.config.MARKERS_COLOR_BUTTON}"), self.change_markers_color_command)
+                    self._markers_button_re), self.change_markers_color_command)
             ],
             states={
                 self.CHANGE_MARKERS_COLOR: [
@@ -414,7 +496,7 @@ class DVChapterBot:
             fallbacks=[
                 CommandHandler("color", self.change_markers_color_command),
                 MessageHandler(filters.Regex(
-                    f"^{self.config.MARKERS_COLOR_BUTTON}"), self.change_markers_color_command),
+                    self._markers_button_re), self.change_markers_color_command),
                 CommandHandler("end", self.end_conversation_callback),
             ],
             conversation_timeout=self.config.GLOBAL_TTL
@@ -426,12 +508,12 @@ class DVChapterBot:
                 CommandHandler(
                     "separator", self.change_chapters_separator_command),
                 MessageHandler(filters.Regex(
-                    f"^{self.config.CHAPTERS_SEPARATOR_BUTTON}"), self.change_chapters_separator_command)
+                    self._separator_button_re), self.change_chapters_separator_command)
             ],
             states={
                 self.CHANGE_CHAPTERS_SEPARATOR: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(
-                        f"^({self.config.CHAPTERS_SEPARATOR_BUTTON}|{self.config.MARKERS_COLOR_BUTTON}|{self.config.HELP_BUTTON})"), self.change_chapters_separator_callback)
+                    MessageHandler(filters.TEXT & ~filters.COMMAND & filters.Regex(
+                        self._not_buttons_re), self.change_chapters_separator_callback)
                 ],
                 self.TIMEOUT: [
                     MessageHandler(
@@ -443,7 +525,7 @@ class DVChapterBot:
                 CommandHandler(
                     "separator", self.change_chapters_separator_command),
                 MessageHandler(filters.Regex(
-                    f"^{self.config.CHAPTERS_SEPARATOR_BUTTON}"), self.change_chapters_separator_command),
+                    self._separator_button_re), self.change_chapters_separator_command),
                 CommandHandler("end", self.end_conversation_callback),
             ],
             conversation_timeout=self.config.GLOBAL_TTL
@@ -457,7 +539,7 @@ class DVChapterBot:
         help_handlers = [
             CommandHandler("help", self.help_command),
             MessageHandler(filters.Regex(
-                f"^{self.config.HELP_BUTTON}$"), self.help_command)
+                self._help_button_re), self.help_command)
         ]
         donate_handler = CommandHandler("donate", self.donate_command)
 
@@ -478,13 +560,11 @@ class DVChapterBot:
         self._setup_handlers()
 
         app = self.application
-        
-        j = app.job_queue
-        j.run_repeating(self._keep_alive, interval=self.config.KEEP_ALIVE_INTERVAL, first=0)
-        
+
         try:
             logger.info("Bot startup...")
-            app.run_polling(allowed_updates=Update.ALL_TYPES)
+            app.run_polling(poll_interval=0.0, timeout=30,
+                            allowed_updates=Update.ALL_TYPES)
         except Exception as e:
             logger.error(f"Exception at bot run: {e}", exc_info=True)
         finally:
@@ -494,12 +574,11 @@ class DVChapterBot:
 def main() -> None:
     try:
         config = Config()
-        client = AsyncClient()
         setup_logging(config.LOGFILE_NAME, config.TELEGRAM_BOT_TOKEN)
-        with DatabaseManager(config.DATABASE_NAME) as db:
-            bot = DVChapterBot(config, db, client)
-            bot.run()
-    except ValueError as e:
+        db = DatabaseManager(config.DATABASE_NAME)
+        bot = DVChapterBot(config, db)
+        bot.run()
+    except (KeyError, ValueError) as e:
         logger.error(f"Configuration error: {e}", exc_info=True)
     except Exception as e:
         logger.error(f"Error during bot startup: {e}", exc_info=True)